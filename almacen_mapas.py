@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from retina import construir_campo, activaciones_vectorizadas
+
+MAPAS_RETINA = ("on", "off", "bipolar_on", "bipolar_off", "comb")
+
+
+# Escritura atómica: se escribe en un temporal propio de este proceso e hilo y se renombra, de modo
+# que dos sesiones guardando la misma imagen nunca dejan un fichero a medias ni mezclado
+def _escribir_atomico(ruta, datos):
+    temporal = ruta.with_name(f"{ruta.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temporal.write_bytes(datos)
+    os.replace(temporal, ruta)
+
+
+# Almacén de mapas de activación en disco, troceado en bloques comprimidos
+# Estructura del directorio:
+#   meta.json                      forma, tamaño de bloque, tipo, niveles y parámetros
+#   <mapa>/<nivel>/<i>.<j>.zz      bloque (i, j) comprimido con zlib
+# El nivel 0 es la resolución completa; cada nivel siguiente promedia bloques de 2x2 del
+# anterior. Se escribe por bandas de filas (en streaming) y se lee por regiones: solo se
+# descomprimen los bloques que tocan la región pedida.
+class EscritorMapas:
+    def __init__(self, ruta, ancho, mapas=MAPAS_RETINA, bloque=(256, 256), niveles=4, dtype=np.float32,
+                 nivel_compresion=3, parametros=None):
+        if bloque[0] % 2:
+            raise ValueError("El alto de bloque debe ser par para poder reducir por bandas")
+        self.ruta = Path(ruta)
+        self.mapas = tuple(mapas)
+        self.bloque = tuple(bloque)
+        self.dtype = np.dtype(dtype)
+        self.nivel_compresion = nivel_compresion
+        self.meta = {"mapas": list(self.mapas), "bloque": list(self.bloque), "dtype": self.dtype.str,
+                     "anchos": [ancho // 2 ** n for n in range(niveles)], "altos": [0] * niveles,
+                     "completo": False, "parametros": parametros or {}}
+        # Filas pendientes de cada mapa y nivel hasta completar una banda de bloques
+        self.pendientes = [{m: [] for m in self.mapas} for _ in range(niveles)]
+        for mapa in self.mapas:
+            for nivel in range(niveles):
+                (self.ruta / mapa / str(nivel)).mkdir(parents=True, exist_ok=True)
+        self._escribir_meta()
+
+    def __enter__(self):
+        return self
+
+    # Si la escritura se interrumpe (p. ej. tarea cancelada), el almacén queda marcado como incompleto
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.cerrar()
+
+    def _escribir_meta(self):
+        _escribir_atomico(self.ruta / "meta.json", json.dumps(self.meta, ensure_ascii=False, indent=1).encode())
+
+    # Añade una banda de filas: un array (filas, ancho) por mapa
+    def anadir_filas(self, bandas):
+        self._anadir(0, {m: np.asarray(bandas[m], dtype=self.dtype) for m in self.mapas})
+        self._escribir_meta()
+
+    def _anadir(self, nivel, bandas, final=False):
+        pendientes = self.pendientes[nivel]
+        for mapa in self.mapas:
+            pendientes[mapa].append(bandas[mapa])
+        acumuladas = sum(b.shape[0] for b in pendientes[self.mapas[0]])
+        alto_bloque = self.bloque[0]
+        while acumuladas >= alto_bloque or (final and acumuladas > 0):
+            banda = {}
+            for mapa in self.mapas:
+                filas = np.concatenate(pendientes[mapa])
+                banda[mapa], resto = filas[:alto_bloque], filas[alto_bloque:]
+                pendientes[mapa][:] = [resto] if resto.shape[0] else []
+            acumuladas -= banda[self.mapas[0]].shape[0]
+            self._escribir_banda(nivel, banda)
+
+    def _escribir_banda(self, nivel, banda):
+        fila_bloque = self.meta["altos"][nivel] // self.bloque[0]
+        alto_banda = banda[self.mapas[0]].shape[0]
+        for mapa, filas in banda.items():
+            for j, col in enumerate(range(0, filas.shape[1], self.bloque[1])):
+                trozo = np.ascontiguousarray(filas[:, col:col + self.bloque[1]])
+                datos = zlib.compress(trozo.tobytes(), self.nivel_compresion)
+                _escribir_atomico(self.ruta / mapa / str(nivel) / f"{fila_bloque}.{j}.zz", datos)
+        self.meta["altos"][nivel] += alto_banda
+
+        # La banda reducida 2x2 alimenta el nivel siguiente
+        if nivel + 1 < len(self.pendientes) and alto_banda >= 2:
+            ancho = self.meta["anchos"][nivel + 1]
+            reducida = {}
+            for mapa, filas in banda.items():
+                filas = filas[:alto_banda // 2 * 2, :ancho * 2]
+                reducida[mapa] = filas.reshape(alto_banda // 2, 2, ancho, 2).mean(axis=(1, 3)).astype(self.dtype)
+            self._anadir(nivel + 1, reducida)
+
+    # Vacía las bandas incompletas de todos los niveles y marca el almacén como completo
+    def cerrar(self):
+        if self.meta["completo"]:
+            return
+        for nivel in range(len(self.pendientes)):
+            self._anadir(nivel, {m: np.empty((0, self.meta["anchos"][nivel]), self.dtype) for m in self.mapas},
+                         final=True)
+        self.meta["completo"] = True
+        self._escribir_meta()
+
+
+class LectorMapas:
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self.meta = json.loads((self.ruta / "meta.json").read_text())
+        self.mapas = tuple(self.meta["mapas"])
+        self.bloque = tuple(self.meta["bloque"])
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.parametros = self.meta["parametros"]
+
+    @property
+    def niveles(self):
+        return len(self.meta["altos"])
+
+    def forma(self, nivel=0):
+        return self.meta["altos"][nivel], self.meta["anchos"][nivel]
+
+    def _bloque(self, mapa, nivel, i, j):
+        alto, ancho = self.forma(nivel)
+        forma = (min(self.bloque[0], alto - i * self.bloque[0]), min(self.bloque[1], ancho - j * self.bloque[1]))
+        datos = zlib.decompress((self.ruta / mapa / str(nivel) / f"{i}.{j}.zz").read_bytes())
+        return np.frombuffer(datos, dtype=self.dtype).reshape(forma)
+
+    # Región [filas, columnas] de un mapa en un nivel; solo se leen los bloques que la cubren
+    # (los cortes admiten paso, pero solo positivo)
+    def leer(self, mapa, filas=slice(None), columnas=slice(None), nivel=0):
+        if any(corte.step is not None and corte.step <= 0 for corte in (filas, columnas)):
+            raise ValueError("Solo se admiten cortes con paso positivo")
+        alto, ancho = self.forma(nivel)
+        f0, f1, paso_f = filas.indices(alto)
+        c0, c1, paso_c = columnas.indices(ancho)
+        salida = np.empty((max(f1 - f0, 0), max(c1 - c0, 0)), dtype=self.dtype)
+        bh, bw = self.bloque
+        for i in range(f0 // bh, -(-f1 // bh)):
+            for j in range(c0 // bw, -(-c1 // bw)):
+                trozo = self._bloque(mapa, nivel, i, j)
+                tf0, tf1 = max(f0, i * bh), min(f1, (i + 1) * bh)
+                tc0, tc1 = max(c0, j * bw), min(c1, (j + 1) * bw)
+                salida[tf0 - f0:tf1 - f0, tc0 - c0:tc1 - c0] = trozo[tf0 - i * bh:tf1 - i * bh, tc0 - j * bw:tc1 - j * bw]
+        return salida[::paso_f, ::paso_c]
+
+    # Nivel más grueso cuyo lado mayor no supera `lado_maximo` (para vistas generales)
+    def nivel_para(self, lado_maximo):
+        for nivel in range(self.niveles):
+            if max(self.forma(nivel)) <= lado_maximo:
+                return nivel
+        return self.niveles - 1
+
+
+# Calcula todos los mapas de la retina por bandas y los va escribiendo en el almacén
+# Cada banda se procesa con un margen de 2 filas para que el resultado coincida con el de la
+# imagen completa. La combinación ON - OFF necesita los máximos globales, que se obtienen en
+# una primera pasada que solo recorre la activación ON. Con `tarea` se informa una vez por banda
+# de cada pasada (y se puede cancelar entre bandas).
+def guardar_retina(ruta, imagen, filas_banda=256, tarea=None, **opciones):
+    campo_on = construir_campo("ON")
+    kernel_bipolar = np.full((5, 5), 1 / 25)
+    alto = imagen.shape[0]
+    n_bandas = -(-alto // filas_banda)
+
+    def informar(pasada, banda):
+        if tarea is not None:
+            tarea.informar((pasada * n_bandas + banda + 1) / (2 * n_bandas))
+
+    def bandas():
+        for f0 in range(0, alto, filas_banda):
+            f1 = min(f0 + filas_banda, alto)
+            m0, m1 = max(f0 - 2, 0), min(f1 + 2, alto)
+            trozo = imagen[m0:m1]
+            recorte = slice(f0 - m0, f0 - m0 + (f1 - f0))
+            yield trozo, recorte
+
+    maximo_on, minimo_on = 0.0, 0.0
+    for banda, (trozo, recorte) in enumerate(bandas()):
+        on = activaciones_vectorizadas(trozo, campo_on)[recorte]
+        maximo_on, minimo_on = max(maximo_on, on.max()), min(minimo_on, on.min())
+        informar(0, banda)
+    # El campo OFF es el ON con el signo cambiado: max(OFF) = -min(ON)
+    escala_on = maximo_on if maximo_on != 0 else 1.0
+    escala_off = -minimo_on if minimo_on != 0 else 1.0
+
+    parametros = {"campo_on": campo_on.tolist(), "max_on": float(maximo_on), "max_off": float(-minimo_on)}
+    with EscritorMapas(ruta, imagen.shape[1], parametros=parametros, **opciones) as escritor:
+        for banda, (trozo, recorte) in enumerate(bandas()):
+            on = activaciones_vectorizadas(trozo, campo_on)[recorte]
+            bipolar = activaciones_vectorizadas(trozo, kernel_bipolar)[recorte]
+            escritor.anadir_filas({"on": on, "off": -on, "bipolar_on": bipolar, "bipolar_off": -bipolar,
+                                   "comb": on / escala_on + on / escala_off})
+            informar(1, banda)
+    return LectorMapas(ruta)
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+DIRECTORIO_CACHE = Path(os.environ.get("ON_OFF_CACHE", Path.home() / ".cache" / "on_off"))
+TAMAÑO_MAXIMO = 512 * 2**20  # 512 MiB
+
+
+# Caché persistente en disco de mapas de activación
+# Cada entrada es un .npy cuyo nombre es el hash del contenido de la imagen y de los parámetros
+# del filtro, de modo que sobrevive a reinicios y se lee como memory map sin recalcular.
+# La fecha de modificación marca el último uso: al superar el tamaño máximo se borran las
+# entradas usadas hace más tiempo (LRU).
+class CacheActivaciones:
+    def __init__(self, directorio=DIRECTORIO_CACHE, tamaño_maximo=TAMAÑO_MAXIMO):
+        self.directorio = Path(directorio)
+        self.tamaño_maximo = tamaño_maximo
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def clave(imagen, filtro, **parametros):
+        h = hashlib.sha256()
+        for array in (np.ascontiguousarray(imagen), np.ascontiguousarray(filtro)):
+            h.update(f"{array.dtype.str}{array.shape}".encode())
+            h.update(array.tobytes())
+        h.update(repr(sorted(parametros.items())).encode())
+        return h.hexdigest()
+
+    def _ruta(self, clave):
+        return self.directorio / f"{clave}.npy"
+
+    def obtener(self, clave):
+        ruta = self._ruta(clave)
+        try:
+            mapa = np.load(ruta, mmap_mode="r")
+            os.utime(ruta)
+        except (FileNotFoundError, ValueError):
+            return None
+        return mapa
+
+    def guardar(self, clave, mapa):
+        # Escritura atómica: otro proceso nunca ve un fichero a medias
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                np.save(f, mapa)
+            os.replace(temporal, self._ruta(clave))
+        except BaseException:
+            os.unlink(temporal)
+            raise
+        self.expulsar()
+
+    def expulsar(self):
+        entradas = []
+        for ruta in self.directorio.glob("*.npy"):
+            try:
+                info = ruta.stat()
+            except FileNotFoundError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, ruta))
+        total = sum(tamaño for _, tamaño, _ in entradas)
+        for _, tamaño, ruta in sorted(entradas):
+            if total <= self.tamaño_maximo:
+                break
+            ruta.unlink(missing_ok=True)
+            total -= tamaño
+
+    def limpiar(self):
+        for ruta in self.directorio.glob("*.npy"):
+            ruta.unlink(missing_ok=True)
+
+
+# convolve2d con caché: la segunda vez que se procesa la misma imagen es un memory map
+def convolucion_cacheada(imagen, filtro, mode="same", boundary="symm", cache=None):
+    from scipy.signal import convolve2d
+    cache = cache or CacheActivaciones()
+    clave = cache.clave(imagen, filtro, mode=mode, boundary=boundary)
+    mapa = cache.obtener(clave)
+    if mapa is None:
+        mapa = convolve2d(imagen, filtro, mode=mode, boundary=boundary)
+        cache.guardar(clave, mapa)
+    return mapa
@@ -0,0 +1,99 @@
+"""Prueba de carga local: simula N sesiones concurrentes que piden los mapas de la retina como la app.
+
+Cada sesión lanza sus peticiones por el mismo camino que streamlit_app.py: una tarea en el
+ejecutor de tareas.py que pide retina_fusionada al almacén compartido con la clave
+("retina", huella, salidas), y después la figura PNG compartida de ese modo.
+
+Uso:
+    python carga.py --sesiones 40 --peticiones 5
+    python carga.py --sesiones 40 --sin-compartir   # referencia: cada sesión calcula por su cuenta
+"""
+import argparse
+import hashlib
+import random
+import threading
+import time
+
+import numpy as np
+
+from compartido import AlmacenCompartido, figura_png
+from fusion import retina_fusionada
+from retina import generar_estímulo
+from tareas import lanzar
+
+ESTIMULOS = ["Letra curva (C)", "Barra vertical", "Círculo", "Cuadrado"]
+
+# Modos de la app que piden mapas de la retina: nombre de la figura y salidas que necesita
+MODOS = [("mapa_2d", ("on",)), ("mapa_2d", ("off",)),
+         ("comparacion", ("norm_on", "norm_off", "comb")),
+         ("bipolares", ("norm_bipolar_on", "norm_bipolar_off", "contraste_bipolar"))]
+
+
+# Figura sin pyplot (no es seguro entre hilos), con un panel por mapa
+def dibujar_mapas(mapas):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(6 * len(mapas), 6))
+    axs = fig.subplots(1, len(mapas), squeeze=False)
+    for ax, (nombre, mapa) in zip(axs[0], mapas.items()):
+        ax.imshow(mapa, cmap="viridis")
+        ax.set_title(nombre)
+        ax.axis("off")
+    return fig
+
+
+def simular_sesion(almacen, peticiones, tamaño, repetido, latencias, barrera, semilla):
+    rng = random.Random(semilla)
+    barrera.wait()
+    for _ in range(peticiones):
+        # Con probabilidad `repetido` la sesión pide la combinación más popular de la clase
+        if rng.random() < repetido:
+            estímulo, (figura, salidas) = "Círculo", MODOS[0]
+        else:
+            estímulo, (figura, salidas) = rng.choice(ESTIMULOS), rng.choice(MODOS)
+        imagen = generar_estímulo(estímulo, tamaño)
+        huella = hashlib.sha1(imagen.tobytes()).hexdigest()
+        clave = ("retina", huella, salidas)
+        inicio = time.perf_counter()
+        if almacen is None:
+            mapas = lanzar(clave, retina_fusionada, imagen, salidas).resultado()
+            figura_png(lambda: dibujar_mapas(mapas))
+        else:
+            mapas = lanzar(clave, almacen.obtener_o_calcular, clave, retina_fusionada, imagen, salidas).resultado()
+            almacen.obtener_o_calcular(("figura", figura, huella, salidas), figura_png, lambda: dibujar_mapas(mapas))
+        latencias.append(time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sesiones", type=int, default=40)
+    parser.add_argument("--peticiones", type=int, default=5, help="peticiones por sesión")
+    parser.add_argument("--tamaño", type=int, default=60, help="lado de la imagen de estímulo")
+    parser.add_argument("--repetido", type=float, default=0.8, help="fracción de peticiones idénticas")
+    parser.add_argument("--max-simultaneos", type=int, default=2, help="cómputos pesados a la vez")
+    parser.add_argument("--sin-compartir", action="store_true", help="desactiva el almacén compartido")
+    args = parser.parse_args()
+
+    almacen = None if args.sin_compartir else AlmacenCompartido(max_simultaneos=args.max_simultaneos)
+    latencias = []
+    barrera = threading.Barrier(args.sesiones)
+    hilos = [threading.Thread(target=simular_sesion,
+                              args=(almacen, args.peticiones, (args.tamaño, args.tamaño), args.repetido,
+                                    latencias, barrera, semilla))
+             for semilla in range(args.sesiones)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - inicio
+
+    latencias_ms = np.array(latencias) * 1000
+    print(f"Sesiones: {args.sesiones}  peticiones: {latencias_ms.size}  tiempo total: {total:.2f} s")
+    print(f"Latencia p50: {np.percentile(latencias_ms, 50):.1f} ms  p99: {np.percentile(latencias_ms, 99):.1f} ms  "
+          f"máx: {latencias_ms.max():.1f} ms")
+    if almacen is not None:
+        print("Almacén:", almacen.estadisticas())
+
+
+if __name__ == "__main__":
+    main()
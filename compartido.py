@@ -0,0 +1,113 @@
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+
+import numpy as np
+
+from tareas import Cancelada
+
+
+def _congelar(resultado):
+    # Los resultados se comparten entre sesiones: nadie debe modificarlos
+    if isinstance(resultado, np.ndarray):
+        resultado.setflags(write=False)
+    elif isinstance(resultado, (tuple, dict)):
+        for elemento in (resultado.values() if isinstance(resultado, dict) else resultado):
+            _congelar(elemento)
+    return resultado
+
+
+# Almacén de resultados compartido por todas las sesiones del proceso
+# - Las peticiones idénticas ya resueltas se sirven desde memoria (LRU con capacidad fija).
+# - Las peticiones idénticas simultáneas esperan a un único cómputo en curso.
+# - Un semáforo limita cuántos cómputos pesados se ejecutan a la vez.
+# Si el cómputo propietario se cancela (tareas.Cancelada), quien esperaba lo reintenta.
+class AlmacenCompartido:
+    def __init__(self, capacidad=256, max_simultaneos=2):
+        self.capacidad = capacidad
+        self.semaforo = threading.BoundedSemaphore(max_simultaneos)
+        self._resultados = OrderedDict()
+        self._en_curso = {}
+        self._cerrojo = threading.Lock()
+        self.aciertos = 0
+        self.calculos = 0
+        self.coalescidas = 0
+
+    def obtener_o_calcular(self, clave, funcion, *args, tarea=None, **kwargs):
+        if tarea is not None:
+            kwargs["tarea"] = tarea
+        while True:
+            with self._cerrojo:
+                if clave in self._resultados:
+                    self._resultados.move_to_end(clave)
+                    self.aciertos += 1
+                    return self._resultados[clave]
+                futuro = self._en_curso.get(clave)
+                propietario = futuro is None
+                if propietario:
+                    futuro = self._en_curso[clave] = Future()
+                    self.calculos += 1
+                else:
+                    self.coalescidas += 1
+
+            if propietario:
+                return self._calcular(clave, futuro, funcion, args, kwargs, tarea)
+            try:
+                return self._esperar(futuro, tarea)
+            except Cancelada:
+                if tarea is not None and tarea.cancelado.is_set():
+                    raise
+
+    def _calcular(self, clave, futuro, funcion, args, kwargs, tarea):
+        try:
+            self._adquirir(tarea)
+            try:
+                resultado = _congelar(funcion(*args, **kwargs))
+            finally:
+                self.semaforo.release()
+        except BaseException as exc:
+            with self._cerrojo:
+                del self._en_curso[clave]
+            futuro.set_exception(exc)
+            raise
+        with self._cerrojo:
+            del self._en_curso[clave]
+            self._resultados[clave] = resultado
+            while len(self._resultados) > self.capacidad:
+                self._resultados.popitem(last=False)
+        futuro.set_result(resultado)
+        return resultado
+
+    # Espera un hueco en el semáforo sin dejar de atender a la cancelación de la tarea
+    def _adquirir(self, tarea):
+        while not self.semaforo.acquire(timeout=0.1):
+            if tarea is not None:
+                tarea.informar(tarea.progreso)
+
+    def _esperar(self, futuro, tarea):
+        while True:
+            try:
+                return futuro.result(timeout=0.1)
+            except TimeoutError:
+                if tarea is not None:
+                    tarea.informar(tarea.progreso)
+
+    def estadisticas(self):
+        with self._cerrojo:
+            return {"aciertos": self.aciertos, "cálculos": self.calculos, "coalescidas": self.coalescidas,
+                    "en memoria": len(self._resultados), "en curso": len(self._en_curso)}
+
+
+# Figura de matplotlib -> PNG, para compartir la imagen ya renderizada
+def figura_png(dibujar, dpi=200):
+    import matplotlib.pyplot as plt
+    fig = dibujar()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=dpi)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+# Único almacén del proceso: Streamlit importa este módulo una sola vez para todas las sesiones
+almacen = AlmacenCompartido()
@@ -0,0 +1,16 @@
+import numpy as np
+
+
+# Reserva de búferes reutilizables, indexados por nombre, forma y tipo
+# Cada sesión guarda el suyo: tras la primera ejecución, las siguientes con la misma
+# imagen reutilizan los mismos arrays en lugar de reservar memoria nueva.
+class EspacioTrabajo:
+    def __init__(self):
+        self.buferes = {}
+
+    def obtener(self, nombre, forma, dtype=float):
+        clave = (nombre, tuple(forma), np.dtype(dtype))
+        bufer = self.buferes.get(clave)
+        if bufer is None:
+            bufer = self.buferes[clave] = np.empty(forma, dtype=dtype)
+        return bufer
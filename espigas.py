@@ -0,0 +1,101 @@
+import numpy as np
+
+# Evento de espiga: instante (paso), posición de la célula y polaridad (+1 ON, -1 OFF)
+EVENTO = np.dtype([("t", "<u4"), ("x", "<u2"), ("y", "<u2"), ("p", "i1")])
+
+
+# Convierte activaciones ON/OFF (H, W) o (T, H, W) en intensidades en [0, 1] por paso
+# Las posiciones de los eventos son de 16 bits: mapas de más de 65535 píxeles de lado se rechazan
+def _intensidades(on, off, pasos, escala):
+    on, off = np.asarray(on, dtype=np.float32), np.asarray(off, dtype=np.float32)
+    limite = np.iinfo(EVENTO["x"]).max + 1
+    if max(on.shape[-2:]) > limite:
+        raise ValueError(f"Mapa de {on.shape[-2]}×{on.shape[-1]}: los eventos admiten como mucho {limite} píxeles de lado")
+    if escala is None:
+        escala = max(on.max(), off.max())
+    escala = escala if escala > 0 else 1.0
+    for t in range(pasos):
+        a_on = on if on.ndim == 2 else on[t]
+        a_off = off if off.ndim == 2 else off[t]
+        yield t, np.clip(a_on / escala, 0, 1), np.clip(a_off / escala, 0, 1)
+
+
+def _informar(tarea, t, pasos):
+    if tarea is not None:
+        tarea.informar((t + 1) / pasos)
+
+
+def _eventos_paso(t, disparos, polaridad):
+    y, x = np.nonzero(disparos)
+    bloque = np.empty(y.size, dtype=EVENTO)
+    bloque["t"], bloque["x"], bloque["y"], bloque["p"] = t, x, y, polaridad
+    return bloque
+
+
+def _concatenar(bloques):
+    return np.concatenate(bloques) if bloques else np.empty(0, dtype=EVENTO)
+
+
+# Con activaciones (T, H, W) el número de pasos lo fija la propia secuencia
+def _num_pasos(on, pasos):
+    return pasos if np.ndim(on) == 2 else len(on)
+
+
+# Codificación por tasa: cada célula dispara en cada paso con probabilidad tasa_max * dt * intensidad
+def espigas_poisson(on, off, pasos=100, dt=1e-3, tasa_max=200.0, escala=None, semilla=None, tarea=None):
+    pasos = _num_pasos(on, pasos)
+    rng = np.random.default_rng(semilla)
+    bloques = []
+    for t, a_on, a_off in _intensidades(on, off, pasos, escala):
+        for polaridad, intensidad in ((1, a_on), (-1, a_off)):
+            disparos = rng.random(intensidad.shape, dtype=np.float32) < tasa_max * dt * intensidad
+            bloques.append(_eventos_paso(t, disparos, polaridad))
+        _informar(tarea, t, pasos)
+    return _concatenar(bloques)
+
+
+# Integración y disparo con fuga: el potencial integra la corriente y se reinicia al superar el umbral
+def espigas_integracion(on, off, pasos=100, dt=1e-3, tau=20e-3, ganancia=200.0, umbral=1.0, escala=None,
+                        tarea=None):
+    pasos = _num_pasos(on, pasos)
+    bloques = []
+    potencial = None
+    for t, a_on, a_off in _intensidades(on, off, pasos, escala):
+        corriente = np.stack([a_on, a_off]) * ganancia
+        if potencial is None:
+            potencial = np.zeros_like(corriente)
+        potencial += dt * (corriente - potencial / tau)
+        disparos = potencial >= umbral
+        potencial[disparos] = 0
+        bloques.append(_eventos_paso(t, disparos[0], 1))
+        bloques.append(_eventos_paso(t, disparos[1], -1))
+        _informar(tarea, t, pasos)
+    return _concatenar(bloques)
+
+
+# Ficheros de eventos: .npy estándar, escrito y leído mediante memory maps
+def guardar_eventos(ruta, eventos):
+    destino = np.lib.format.open_memmap(ruta, mode="w+", dtype=EVENTO, shape=eventos.shape)
+    destino[:] = eventos
+    destino.flush()
+    del destino
+
+
+def cargar_eventos(ruta):
+    return np.load(ruta, mmap_mode="r")
+
+
+# Eventos con t0 <= t < t1 (los eventos están ordenados por instante)
+def ventana_eventos(eventos, t0, t1):
+    inicio, fin = np.searchsorted(eventos["t"], [t0, t1])
+    return eventos[inicio:fin]
+
+
+# Recuento de espigas por célula y polaridad, para visualizar
+def conteos(eventos, forma):
+    conteo_on = np.zeros(forma, dtype=np.int64)
+    conteo_off = np.zeros(forma, dtype=np.int64)
+    for polaridad, conteo in ((1, conteo_on), (-1, conteo_off)):
+        seleccion = eventos[eventos["p"] == polaridad]
+        np.add.at(conteo, (seleccion["y"], seleccion["x"]), 1)
+    return conteo_on, conteo_off
@@ -0,0 +1,90 @@
+import numpy as np
+
+from retina import construir_campo
+
+SALIDAS = ("bipolar_on", "bipolar_off", "on", "off",
+           "norm_on", "norm_off", "comb", "norm_bipolar_on", "norm_bipolar_off", "contraste_bipolar")
+
+
+# Suma de ventanas de lado `lado` a lo largo de un eje (filtro de caja separable)
+def _suma_ventana(bloque, lado, eje):
+    n = bloque.shape[eje] - lado + 1
+    corte = (lambda k: bloque[k:k + n]) if eje == 0 else (lambda k: bloque[:, k:k + n])
+    suma = corte(0).copy()
+    for k in range(1, lado):
+        suma += corte(k)
+    return suma
+
+
+# Todas las salidas de la retina en una sola pasada por bloques de filas
+# Cada bloque (con 2 filas de halo) se lee una vez y, mientras está en caché, se obtienen:
+#   - bipolar = media 5x5 (filtro de caja separable), bipolar_off = -bipolar
+#   - on = correlación con construir_campo("ON") (solo sus pesos no nulos), off = -on
+# y se actualizan los máximos necesarios para normalizar. Las salidas normalizadas se
+# escriben al final escalando las salidas ya calculadas, sin volver a leer la imagen.
+# Los bordes sin vecindario completo quedan a cero, como en calcular_activaciones.
+def retina_fusionada(imagen, salidas=SALIDAS, filas_bloque=64, campo=None, espacio=None, tarea=None):
+    imagen = np.asarray(imagen)
+    dtype = imagen.dtype if np.issubdtype(imagen.dtype, np.floating) else np.float64
+    campo = construir_campo("ON") if campo is None else campo
+    alto, ancho = imagen.shape
+    resultado = {}
+    for nombre in salidas:
+        if nombre not in SALIDAS:
+            raise ValueError(f"Salida desconocida: {nombre}")
+        bufer = None if espacio is None else espacio.obtener(nombre, imagen.shape, dtype)
+        resultado[nombre] = np.zeros(imagen.shape, dtype) if bufer is None else bufer
+        resultado[nombre].fill(0)
+    if alto < 5 or ancho < 5:
+        return resultado
+
+    necesita = lambda *nombres: any(n in resultado for n in nombres)
+    calcular_on = necesita("on", "off", "norm_on", "norm_off", "comb")
+    calcular_bipolar = necesita("bipolar_on", "bipolar_off", "norm_bipolar_on", "norm_bipolar_off",
+                                "contraste_bipolar")
+    pesos = [(i, j, campo[i, j]) for i in range(5) for j in range(5) if campo[i, j] != 0]
+    maximo_on, minimo_on, maximo_bipolar = 0.0, 0.0, 0.0
+    on_bloque = bipolar_bloque = None
+
+    for f0 in range(2, alto - 2, filas_bloque):
+        f1 = min(f0 + filas_bloque, alto - 2)
+        bloque = imagen[f0 - 2:f1 + 2].astype(dtype, copy=False)
+        destino = (slice(f0, f1), slice(2, ancho - 2))
+
+        if calcular_on:
+            on_bloque = np.zeros((f1 - f0, ancho - 4), dtype)
+            for i, j, peso in pesos:
+                on_bloque += peso * bloque[i:i + f1 - f0, j:j + ancho - 4]
+            maximo_on, minimo_on = max(maximo_on, on_bloque.max()), min(minimo_on, on_bloque.min())
+            for nombre, signo in (("on", 1), ("off", -1)):
+                if nombre in resultado:
+                    np.multiply(on_bloque, signo, out=resultado[nombre][destino])
+
+        if calcular_bipolar:
+            bipolar_bloque = _suma_ventana(_suma_ventana(bloque, 5, 0), 5, 1) / 25
+            maximo_bipolar = max(maximo_bipolar, np.abs(bipolar_bloque).max())
+            for nombre, signo in (("bipolar_on", 1), ("bipolar_off", -1)):
+                if nombre in resultado:
+                    np.multiply(bipolar_bloque, signo, out=resultado[nombre][destino])
+
+        # Las normalizadas se guardan de momento sin escalar; se escalan al terminar
+        for nombre, origen in (("norm_on", on_bloque), ("norm_off", on_bloque), ("comb", on_bloque),
+                               ("norm_bipolar_on", bipolar_bloque), ("norm_bipolar_off", bipolar_bloque),
+                               ("contraste_bipolar", bipolar_bloque)):
+            if nombre in resultado:
+                resultado[nombre][destino] = origen
+        if tarea is not None:
+            tarea.informar((f1 - 2) / (alto - 4), resultado[salidas[0]] if salidas else None)
+
+    # Escalas de normalización a partir de los máximos acumulados
+    # Como OFF = -ON: norm_off = -on / max(off) = on / min(on)
+    escala_on = 1 / maximo_on if maximo_on != 0 else 1.0
+    escala_off = 1 / minimo_on if minimo_on != 0 else -1.0
+    escala_bipolar = 1 / maximo_bipolar if maximo_bipolar != 0 else 1.0
+    escalas = {"norm_on": escala_on, "norm_off": escala_off, "comb": escala_on - escala_off,
+               "norm_bipolar_on": escala_bipolar, "norm_bipolar_off": -escala_bipolar,
+               "contraste_bipolar": 2 * escala_bipolar}
+    for nombre, escala in escalas.items():
+        if nombre in resultado:
+            resultado[nombre] *= escala
+    return resultado
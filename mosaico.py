@@ -0,0 +1,129 @@
+import numpy as np
+
+# Pesos totales del campo de construir_campo: centro +6 (1 píxel) y periferia -8 (8 píxeles × -1)
+PESO_CENTRO = 6.0
+PESO_PERIFERIA = -8.0
+
+
+# Mosaico foveal: posiciones, escala del campo receptivo y polaridad de cada célula
+# La escala crece linealmente con la excentricidad (distancia a la fóvea) y la densidad de
+# células decrece como 1 / escala², de modo que la periferia queda cubierta por menos células
+# con campos más grandes. Devuelve un array estructurado con campos y, x, escala y polaridad.
+MOSAICO = np.dtype([("y", "<f4"), ("x", "<f4"), ("escala", "<f4"), ("polaridad", "i1")])
+
+
+def escala_por_excentricidad(excentricidad, escala_fovea=1.0, pendiente=0.03):
+    return escala_fovea + pendiente * excentricidad
+
+
+# Escala en la fóvea para que cada píxel quede cubierto, de media, por `cobertura` campos
+# Con densidad ∝ 1 / escala² (escala = escala_fovea * h, h = 1 + aumento * excentricidad), la
+# densidad en cada punto es n_celulas / (escala_fovea² * ∫ h⁻² dA) y el campo (periferia incluida)
+# cubre π (2 * escala)²: su producto es la cobertura, que así no depende de la excentricidad.
+# La integral se aproxima sumando sobre una rejilla de como mucho 512 x 512 puntos.
+def escala_fovea_para(forma, n_celulas, fovea, cobertura=4.0, aumento=0.03):
+    paso = max(1, max(forma) // 512)
+    y, x = np.ogrid[paso / 2:forma[0]:paso, paso / 2:forma[1]:paso]
+    h = 1 + aumento * np.hypot(y - fovea[0], x - fovea[1])
+    integral = np.sum(h ** -2.0) * paso ** 2
+    return float(np.sqrt(cobertura * integral / (4 * np.pi * n_celulas)))
+
+
+# `escala_fovea` y la pendiente se derivan de n_celulas y del área de la rejilla: al añadir células
+# los campos se encogen con la separación local entre células, de modo que la cobertura por píxel
+# (y el número de pesos no nulos del operador, unos cobertura x píxeles) se mantiene constante.
+# `aumento` es el crecimiento relativo de la escala por píxel de excentricidad.
+def generar_mosaico(forma, n_celulas, fovea=None, cobertura=4.0, aumento=0.03, semilla=None):
+    rng = np.random.default_rng(semilla)
+    fovea = np.array(fovea if fovea is not None else (forma[0] / 2, forma[1] / 2), dtype=np.float32)
+    escala_fovea = escala_fovea_para(forma, n_celulas, fovea, cobertura, aumento)
+    pendiente = aumento * escala_fovea
+    celulas = np.empty(0, dtype=MOSAICO)
+    while celulas.size < n_celulas:
+        # Muestreo por rechazo: candidatas uniformes aceptadas con probabilidad (escala_fovea / escala)²
+        faltan = n_celulas - celulas.size
+        candidatas = rng.random((4 * faltan + 16, 2), dtype=np.float32) * np.array(forma, dtype=np.float32)
+        escala = escala_por_excentricidad(np.linalg.norm(candidatas - fovea, axis=1), escala_fovea, pendiente)
+        aceptadas = rng.random(escala.size) < (escala_fovea / escala) ** 2
+        nuevas = np.empty(int(aceptadas.sum()), dtype=MOSAICO)
+        nuevas["y"], nuevas["x"] = candidatas[aceptadas, 0], candidatas[aceptadas, 1]
+        nuevas["escala"] = escala[aceptadas]
+        nuevas["polaridad"] = rng.choice(np.array([1, -1], dtype=np.int8), size=nuevas.size)
+        celulas = np.concatenate([celulas, nuevas])
+    return celulas[:n_celulas]
+
+
+# Compila toda la población en una matriz dispersa CSR de forma (n_celulas, alto * ancho)
+# Cada célula es un campo centro-periferia como construir_campo pero escalado: centro a distancia
+# < escala y periferia a distancia < 2 * escala de su posición real, con los mismos pesos totales.
+# La rejilla de píxeles hace de índice espacial: cada célula solo recorre los píxeles del disco
+# que rodea su posición, y las células se agrupan por radio para procesar cada grupo vectorizado.
+# Los índices son int32 y cada grupo se copia directamente a su sitio en los arrays CSR (sus
+# columnas ya salen ordenadas por fila del disco), sin pasar por listas COO de int64.
+def compilar_operador(celulas, forma, tarea=None):
+    from scipy.sparse import csr_matrix
+
+    alto, ancho = forma
+    tipo_pixel = np.int32 if alto * ancho < 2 ** 31 else np.int64
+    radios = np.ceil(2 * celulas["escala"]).astype(np.int64)
+    grupos = np.unique(radios)
+    por_celula = np.zeros(celulas.size, dtype=np.int64)
+    trozos = []
+    for n, radio in enumerate(grupos):
+        indices = np.nonzero(radios == radio)[0]
+        grupo = celulas[indices]
+        # Desplazamientos del disco que puede tocar el campo (radio más el descentrado del píxel)
+        dy, dx = np.mgrid[-radio:radio + 1, -radio:radio + 1]
+        disco = dy ** 2 + dx ** 2 < (radio + 0.75) ** 2
+        dy, dx = dy[disco].astype(tipo_pixel), dx[disco].astype(tipo_pixel)
+        py = np.floor(grupo["y"]).astype(tipo_pixel)[:, None] + dy
+        px = np.floor(grupo["x"]).astype(tipo_pixel)[:, None] + dx
+        distancia = np.hypot(py + np.float32(0.5) - grupo["y"][:, None], px + np.float32(0.5) - grupo["x"][:, None])
+        escala = grupo["escala"][:, None]
+        dentro = (py >= 0) & (py < alto) & (px >= 0) & (px < ancho)
+        centro = dentro & (distancia < escala)
+        periferia = dentro & ~centro & (distancia < 2 * escala)
+        # Las células muy pequeñas o descentradas pueden no cubrir ningún píxel con el centro:
+        # se usa el píxel más cercano
+        sin_centro = ~centro.any(axis=1)
+        if sin_centro.any():
+            cercano = np.where(dentro, distancia, np.inf)[sin_centro].argmin(axis=1)
+            centro[np.nonzero(sin_centro)[0], cercano] = True
+            periferia &= ~centro
+        n_centro = centro.sum(axis=1, keepdims=True)
+        n_periferia = np.maximum(periferia.sum(axis=1, keepdims=True), 1)
+        peso = (centro * np.float32(PESO_CENTRO) / np.maximum(n_centro, 1).astype(np.float32)
+                + periferia * np.float32(PESO_PERIFERIA) / n_periferia.astype(np.float32))
+        peso *= grupo["polaridad"][:, None]
+        activo = centro | periferia
+        por_celula[indices] = activo.sum(axis=1)
+        trozos.append((indices, por_celula[indices], (py * ancho + px)[activo], peso[activo]))
+        if tarea is not None:
+            tarea.informar((n + 1) / grupos.size)
+
+    nnz = int(por_celula.sum())
+    tipo_indice = np.int32 if max(nnz, alto * ancho) < 2 ** 31 else np.int64
+    indptr = np.zeros(celulas.size + 1, dtype=tipo_indice)
+    np.cumsum(por_celula, out=indptr[1:])
+    columnas = np.empty(nnz, dtype=tipo_indice)
+    valores = np.empty(nnz, dtype=np.float32)
+    while trozos:
+        # Posición de cada valor del grupo: inicio de la fila de su célula + orden dentro de ella
+        indices, cuantos, cols, pesos = trozos.pop()
+        inicio = np.repeat(indptr[indices] - np.concatenate(([0], np.cumsum(cuantos)[:-1])), cuantos)
+        destino = inicio + np.arange(cols.size)
+        columnas[destino], valores[destino] = cols, pesos
+    return csr_matrix((valores, columnas, indptr), shape=(celulas.size, alto * ancho))
+
+
+def mosaico_compilado(forma, n_celulas, semilla=0, tarea=None, **parametros):
+    celulas = generar_mosaico(forma, n_celulas, semilla=semilla, **parametros)
+    return celulas, compilar_operador(celulas, forma, tarea=tarea)
+
+
+# Respuestas de todas las células a un lote de imágenes (B, alto, ancho): un único producto disperso
+def respuestas_mosaico(operador, imagenes):
+    imagenes = np.asarray(imagenes, dtype=np.float32)
+    if imagenes.ndim == 2:
+        imagenes = imagenes[None]
+    return np.asarray(operador @ imagenes.reshape(imagenes.shape[0], -1).T)
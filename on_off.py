@@ -452,7 +452,6 @@ import numpy as np
 import requests
 from PIL import Image
 from io import BytesIO
-from scipy.signal import convolve2d
 import cv2
 
 from google.colab import files
@@ -486,9 +485,18 @@ def filtro_off():
     f[2,2] = -8
     return f
 
-# Paso 4: Aplicar convoluciones
-activacion_on = convolve2d(img_array, filtro_on(), mode='same', boundary='symm')
-activacion_off = convolve2d(img_array, filtro_off(), mode='same', boundary='symm')
+# Paso 4: Aplicar convoluciones (con caché en disco: si la imagen ya se procesó, se lee el resultado)
+try:
+    from cache_disco import convolucion_cacheada
+except ImportError:
+    # Sin cache_disco.py junto al cuaderno (p. ej. en Colab): convolución directa, sin caché
+    from scipy.signal import convolve2d
+
+    def convolucion_cacheada(imagen, filtro, mode='same', boundary='symm'):
+        return convolve2d(imagen, filtro, mode=mode, boundary=boundary)
+
+activacion_on = convolucion_cacheada(img_array, filtro_on(), mode='same', boundary='symm')
+activacion_off = convolucion_cacheada(img_array, filtro_off(), mode='same', boundary='symm')
 
 # Paso 5: Visualizar resultados
 fig, axs = plt.subplots(1, 3, figsize=(18,6))
@@ -0,0 +1,79 @@
+import numpy as np
+
+from retina import construir_campo, activaciones_vectorizadas
+
+
+# Reducción por bloques: promedio de cada bloque factor x factor (se descartan los bordes sobrantes)
+# El promedio se acumula directamente en float32, sin convertir antes la imagen completa.
+def reducir(imagen, factor):
+    if factor == 1:
+        return np.asarray(imagen, dtype=np.float32)
+    alto, ancho = imagen.shape[0] // factor, imagen.shape[1] // factor
+    bloques = np.asarray(imagen)[:alto * factor, :ancho * factor]
+    return bloques.reshape(alto, factor, ancho, factor).mean(axis=(1, 3), dtype=np.float32)
+
+
+# Número de niveles para que el más grueso tenga como mucho `lado_maximo` píxeles de lado
+def numero_niveles(forma, lado_maximo=128):
+    niveles = 1
+    while max(forma) / 2 ** (niveles - 1) > lado_maximo:
+        niveles += 1
+    return niveles
+
+
+# Campo receptivo escalado a un nivel con factor f
+# Cada peso del campo 5x5 se reparte por interpolación bilineal entre los píxeles gruesos que
+# rodean su desplazamiento (i-2, j-2) / f. Así, aplicado sobre la imagen reducida, aproxima la
+# respuesta del campo original a resolución completa. Con f = 1 es exactamente construir_campo.
+def campo_escalado(tipo="ON", factor=1):
+    campo = construir_campo(tipo)
+    if factor == 1:
+        return campo
+    radio = int(np.ceil(2 / factor))
+    escalado = np.zeros((2 * radio + 1, 2 * radio + 1))
+    for i in range(5):
+        for j in range(5):
+            di, dj = (i - 2) / factor + radio, (j - 2) / factor + radio
+            i0, j0 = int(np.floor(di)), int(np.floor(dj))
+            fi, fj = di - i0, dj - j0
+            for ii, wi in ((i0, 1 - fi), (i0 + 1, fi)):
+                for jj, wj in ((j0, 1 - fj), (j0 + 1, fj)):
+                    if wi * wj:
+                        escalado[ii, jj] += campo[i, j] * wi * wj
+    return escalado
+
+
+# Activaciones ON de grueso a fino, en float32
+# Devuelve, nivel a nivel, (factor, region, on, escala_on, escala_off) con el mapa ON a la
+# resolución del nivel. Los demás mapas se derivan de él sin guardarlos (el campo OFF es el ON
+# con el signo invertido): off = -on, norm_on = on * escala_on, norm_off = on * escala_off y
+# comb = norm_on - norm_off = on * (escala_on - escala_off).
+# El primer nivel se toma por muestreo puntual, así que su coste no depende del tamaño de la
+# imagen. Con `region` = (fila0, fila1, col0, col1) en píxeles de la imagen original, los niveles
+# más finos que el primero solo se calculan dentro de esa región. Sin región, `lado_visible`
+# detiene el refinado en el último nivel cuyo lado mayor no lo supera (la resolución a la que se
+# va a mostrar); con None se llega hasta la resolución completa.
+def activaciones_progresivas(imagen, lado_maximo=128, region=None, lado_visible=None):
+    niveles = numero_niveles(imagen.shape, lado_maximo)
+    for nivel in reversed(range(niveles)):
+        factor = 2 ** nivel
+        if nivel == niveles - 1 and factor > 1:
+            reducida = np.asarray(imagen[factor // 2::factor, factor // 2::factor], dtype=np.float32)
+            zona = None
+        elif region is None or nivel == niveles - 1:
+            if region is None and lado_visible is not None and max(imagen.shape) // factor > lado_visible:
+                return
+            reducida = reducir(imagen, factor)
+            zona = None
+        else:
+            # Región con un margen del radio del campo para que su borde no quede a cero
+            margen = 2 * factor
+            f0, f1 = max(region[0] - margen, 0), min(region[1] + margen, imagen.shape[0])
+            c0, c1 = max(region[2] - margen, 0), min(region[3] + margen, imagen.shape[1])
+            reducida = reducir(imagen[f0:f1, c0:c1], factor)
+            zona = (f0, f1, c0, c1)
+        on = activaciones_vectorizadas(reducida, campo_escalado("ON", factor), dtype=np.float32)
+        maximo, minimo = on.max(), on.min()
+        escala_on = 1 / maximo if maximo != 0 else 1.0
+        escala_off = 1 / minimo if minimo != 0 else -1.0
+        yield factor, zona, on, escala_on, escala_off
@@ -0,0 +1,85 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Construcción de campos receptivos
+def construir_campo(tipo="ON"):
+    campo = np.zeros((5,5))
+    for i in range(5):
+        for j in range(5):
+            distancia = np.sqrt((i-2)**2 + (j-2)**2)
+            if distancia < 1.0:
+                campo[i,j] = 6 if tipo=="ON" else -6
+            elif distancia < 2.0:
+                campo[i,j] = -1 if tipo=="ON" else 1
+    return campo
+
+# Estímulo visual
+def generar_estímulo(nombre, tamaño=(20, 20)):
+    img = np.zeros(tamaño)
+    if nombre == "Letra curva (C)":
+        img[5:15, 5] = 1
+        img[5, 5:12] = 1
+        img[15, 5:12] = 1
+    elif nombre == "Barra vertical":
+        img[:, tamaño[1]//2] = 1
+    elif nombre == "Círculo":
+        rr, cc = np.ogrid[:tamaño[0], :tamaño[1]]
+        centro = (tamaño[0]//2, tamaño[1]//2)
+        radio = 6
+        mascara = (rr - centro[0])**2 + (cc - centro[1])**2 <= radio**2
+        img[mascara] = 1
+    elif nombre == "Cuadrado":
+        img[6:14, 6:14] = 1
+    elif nombre == "Ruido aleatorio":
+        img = np.random.rand(*tamaño)
+    return img
+
+# Aplicar campo en posición
+def aplicar_en_posicion(imagen, campo, fila, col):
+    subimagen = imagen[fila:fila+5, col:col+5]
+    if subimagen.shape != (5,5):
+        return None
+    return np.sum(subimagen * campo)
+
+# Activación completa
+def calcular_activaciones(imagen, campo):
+    activaciones = np.zeros_like(imagen)
+    for fila in range(imagen.shape[0]-4):
+        for col in range(imagen.shape[1]-4):
+            act = aplicar_en_posicion(imagen, campo, fila, col)
+            if act is not None:
+                activaciones[fila+2, col+2] = act
+    return activaciones
+
+# Solo Bipolares
+def procesamiento_bipolar(imagen):
+    # Simulación: respuesta local sin antagonismo
+    kernel = np.ones((5,5), np.float32) / 25
+    salida = np.zeros_like(imagen)
+    for fila in range(imagen.shape[0]-4):
+        for col in range(imagen.shape[1]-4):
+            sub = imagen[fila:fila+5, col:col+5]
+            salida[fila+2, col+2] = np.sum(sub * kernel)
+    return salida
+
+def procesamiento_bipolar_off(imagen):
+    # Simulación inversa: respuesta a decrementos de luz
+    kernel = np.ones((5,5), np.float32) / 25
+    salida = np.zeros_like(imagen)
+    for fila in range(imagen.shape[0]-4):
+        for col in range(imagen.shape[1]-4):
+            sub = imagen[fila:fila+5, col:col+5]
+            salida[fila+2, col+2] = -np.sum(sub * kernel)  # inversión de polaridad
+    return salida
+
+# Activación vectorizada: mismo resultado que calcular_activaciones, sin bucles
+# (admite cualquier campo de lado impar; el borde sin vecindario completo queda a cero;
+# `dtype` fija la precisión de la salida y del cálculo)
+def activaciones_vectorizadas(imagen, campo, dtype=float):
+    activaciones = np.zeros_like(imagen, dtype=dtype)
+    r = campo.shape[0] // 2
+    if imagen.shape[0] < campo.shape[0] or imagen.shape[1] < campo.shape[1]:
+        return activaciones
+    ventanas = sliding_window_view(imagen, campo.shape)
+    activaciones[r:imagen.shape[0]-r, r:imagen.shape[1]-r] = np.einsum('ijkl,kl->ij', ventanas, campo.astype(dtype))
+    return activaciones
@@ -3,6 +3,18 @@ import numpy as np
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 import time
+import hashlib
+
+from retina import construir_campo, generar_estímulo, aplicar_en_posicion
+from fusion import retina_fusionada
+from video import PipelineVideo, colorear
+from tareas import tarea_de_sesion, cancelar_tarea_de_sesion
+from compartido import almacen, figura_png
+from espigas import espigas_poisson, espigas_integracion, conteos, EVENTO
+from piramide import activaciones_progresivas
+from almacen_mapas import guardar_retina
+from mosaico import mosaico_compilado, respuestas_mosaico
+from espacio_trabajo import EspacioTrabajo
 
 st.set_page_config(layout="wide")
 st.title("🧠 Simulación de campos receptivos ON y OFF")
@@ -19,113 +31,99 @@ estímulo = st.sidebar.selectbox("Selecciona el estímulo visual", [
 ])
 
 tipo_celda = st.sidebar.selectbox("Tipo de célula:", ["Centro ON / Periferia OFF", "Centro OFF / Periferia ON"])
-visualizacion = st.sidebar.selectbox("Modo de visualización:", ["Mapa 2D", "Mapa 3D", "Animación paso a paso", "Comparación ON / OFF / Combinado", "Solo Bipolares"])
+visualizacion = st.sidebar.selectbox("Modo de visualización:", ["Mapa 2D", "Mapa 3D", "Animación paso a paso", "Comparación ON / OFF / Combinado", "Solo Bipolares", "Vídeo en directo", "Espigas ON / OFF", "Progresivo (imagen grande)", "Mosaico foveal"])
 velocidad = st.sidebar.slider("Velocidad de animación (segundos por paso):", min_value=0.01, max_value=1.0, value=0.3, step=0.01) if visualizacion == "Animación paso a paso" else None
-
-# Construcción de campos receptivos
-def construir_campo(tipo="ON"):
-    campo = np.zeros((5,5))
-    for i in range(5):
-        for j in range(5):
-            distancia = np.sqrt((i-2)**2 + (j-2)**2)
-            if distancia < 1.0:
-                campo[i,j] = 6 if tipo=="ON" else -6
-            elif distancia < 2.0:
-                campo[i,j] = -1 if tipo=="ON" else 1
-    return campo
-
-# Estímulo visual
-def generar_estímulo(nombre, tamaño=(20, 20)):
-    img = np.zeros(tamaño)
-    if nombre == "Letra curva (C)":
-        img[5:15, 5] = 1
-        img[5, 5:12] = 1
-        img[15, 5:12] = 1
-    elif nombre == "Barra vertical":
-        img[:, tamaño[1]//2] = 1
-    elif nombre == "Círculo":
-        rr, cc = np.ogrid[:tamaño[0], :tamaño[1]]
-        centro = (tamaño[0]//2, tamaño[1]//2)
-        radio = 6
-        mascara = (rr - centro[0])**2 + (cc - centro[1])**2 <= radio**2
-        img[mascara] = 1
-    elif nombre == "Cuadrado":
-        img[6:14, 6:14] = 1
-    elif nombre == "Ruido aleatorio":
-        img = np.random.rand(*tamaño)
-    return img
-
-# Aplicar campo en posición
-def aplicar_en_posicion(imagen, campo, fila, col):
-    subimagen = imagen[fila:fila+5, col:col+5]
-    if subimagen.shape != (5,5):
-        return None
-    return np.sum(subimagen * campo)
-
-# Activación completa
-def calcular_activaciones(imagen, campo):
-    activaciones = np.zeros_like(imagen)
-    for fila in range(imagen.shape[0]-4):
-        for col in range(imagen.shape[1]-4):
-            act = aplicar_en_posicion(imagen, campo, fila, col)
-            if act is not None:
-                activaciones[fila+2, col+2] = act
-    return activaciones
-
-# Solo Bipolares
-def procesamiento_bipolar(imagen):
-    # Simulación: respuesta local sin antagonismo
-    kernel = np.ones((5,5), np.float32) / 25
-    salida = np.zeros_like(imagen)
-    for fila in range(imagen.shape[0]-4):
-        for col in range(imagen.shape[1]-4):
-            sub = imagen[fila:fila+5, col:col+5]
-            salida[fila+2, col+2] = np.sum(sub * kernel)
-    return salida
-
-def procesamiento_bipolar_off(imagen):
-    # Simulación inversa: respuesta a decrementos de luz
-    kernel = np.ones((5,5), np.float32) / 25
-    salida = np.zeros_like(imagen)
-    for fila in range(imagen.shape[0]-4):
-        for col in range(imagen.shape[1]-4):
-            sub = imagen[fila:fila+5, col:col+5]
-            salida[fila+2, col+2] = -np.sum(sub * kernel)  # inversión de polaridad
-    return salida
+if visualizacion == "Vídeo en directo":
+    ruta_video = st.sidebar.text_input("Vídeo local o secuencia de imágenes (carpeta o patrón *.png):")
+    fps_objetivo = st.sidebar.slider("FPS objetivo:", min_value=1, max_value=60, value=15)
+    modo_temporal = st.sidebar.checkbox("Respuesta temporal (ON/OFF transitorio)", value=False)
+if visualizacion == "Espigas ON / OFF":
+    codificacion = st.sidebar.selectbox("Codificación:", ["Poisson (tasa)", "Integración y disparo"])
+    pasos_espigas = st.sidebar.slider("Pasos de tiempo (1 ms):", min_value=10, max_value=1000, value=200, step=10)
+if visualizacion == "Progresivo (imagen grande)":
+    archivo_imagen = st.sidebar.file_uploader("Imagen propia:", type=["png", "jpg", "jpeg", "bmp", "tif", "tiff"])
+    solo_region = st.sidebar.checkbox("Refinar solo una región", value=False)
+    if solo_region:
+        filas_region = st.sidebar.slider("Filas de la región (%):", 0, 100, (25, 75))
+        columnas_region = st.sidebar.slider("Columnas de la región (%):", 0, 100, (25, 75))
+if visualizacion == "Mosaico foveal":
+    n_celulas = st.sidebar.slider("Número de células:", min_value=500, max_value=20000, value=4000, step=500)
+
+# Los modos sin cómputo en segundo plano no llegan a tarea_de_sesion: la tarea que quedara de
+# otro modo se cancela aquí para que no siga ocupando el ejecutor (en Progresivo, el guardado
+# en disco solo se lanza y se espera en la ejecución en la que se pulsa el botón)
+if visualizacion in ("Animación paso a paso", "Vídeo en directo", "Progresivo (imagen grande)"):
+    cancelar_tarea_de_sesion(st.session_state)
+
+# Cómputo en segundo plano: mientras tanto se muestran el avance y el mapa parcial.
+# Si las entradas cambian, la siguiente ejecución del script cancela la tarea en curso.
+def calcular_en_segundo_plano(clave, funcion, *args, **kwargs):
+    tarea = tarea_de_sesion(st.session_state, clave, funcion, *args, **kwargs)
+    if not tarea.terminada():
+        barra = st.progress(0.0, text="⏳ Calculando…")
+        area_parcial = st.empty()
+        while not tarea.terminada():
+            barra.progress(tarea.progreso, text=f"⏳ Calculando… {tarea.progreso:.0%}")
+            if tarea.parcial is not None:
+                area_parcial.image(colorear(tarea.parcial), caption="Resultado parcial", width=300)
+            time.sleep(0.1)
+        barra.empty()
+        area_parcial.empty()
+    return tarea.resultado()
+
+# Resultados deterministas: se comparten entre todas las sesiones del servidor
+def calcular_compartido(clave, funcion, *args):
+    return calcular_en_segundo_plano(clave, almacen.obtener_o_calcular, clave, funcion, *args)
+
+# Figura compartida: solo la primera sesión con esta clave la dibuja y la renderiza
+def mostrar_figura_compartida(clave, dibujar):
+    st.image(almacen.obtener_o_calcular(("figura",) + clave, figura_png, dibujar), use_container_width=True)
+
+# Espigas ganglionares a partir de las activaciones ON/OFF rectificadas
+# No se comparten entre sesiones (son aleatorias): los mapas intermedios se escriben en los
+# búferes del espacio de trabajo de la sesión y se rectifican in situ.
+def espigas_ganglionares(imagen, codificacion, pasos, espacio=None, tarea=None):
+    activaciones = retina_fusionada(imagen, ("on", "off"), espacio=espacio, tarea=tarea)
+    gang_on = np.maximum(activaciones["on"], 0, out=activaciones["on"])
+    gang_off = np.maximum(activaciones["off"], 0, out=activaciones["off"])
+    if codificacion == "Poisson (tasa)":
+        return espigas_poisson(gang_on, gang_off, pasos=pasos, tarea=tarea)
+    return espigas_integracion(gang_on, gang_off, pasos=pasos, tarea=tarea)
 
 # Preparar datos
 imagen = generar_estímulo(estímulo)
+huella = hashlib.sha1(imagen.tobytes()).hexdigest()
 campo = construir_campo("ON" if tipo_celda.startswith("Centro ON") else "OFF")
 
-if visualizacion == "Comparación ON / OFF / Combinado":
-    campo_on = construir_campo("ON")
-    campo_off = construir_campo("OFF")
-else:
-    activaciones = calcular_activaciones(imagen, campo)
+if visualizacion in ("Mapa 2D", "Mapa 3D"):
+    salida = "on" if tipo_celda.startswith("Centro ON") else "off"
+    activaciones = calcular_compartido(("retina", huella, (salida,)), retina_fusionada, imagen, (salida,))[salida]
 
 # Visualización
 if visualizacion == "Mapa 2D":
-    fig, axs = plt.subplots(1, 3, figsize=(22,6))
-    axs[0].imshow(imagen, cmap='gray')
-    axs[0].set_title(f"Estímulo visual: {estímulo}")
-    axs[0].axis('off')
-
-    axs[1].imshow(campo, cmap='bwr', vmin=-6, vmax=6)
-    axs[1].set_title(f"Campo receptivo: {tipo_celda}")
-    for i in range(5):
-        for j in range(5):
-            val = campo[i,j]
-            axs[1].text(j, i, f"{val:.0f}", ha='center', va='center', color='black', fontsize=8)
-    circ = plt.Circle((2,2), 2.0, color='black', fill=False, linestyle='--', linewidth=1)
-    axs[1].add_patch(circ)
-    axs[1].grid(True)
-    axs[1].axis('off')
-
-    axs[2].imshow(activaciones, cmap='viridis')
-    axs[2].set_title("Activación de múltiples células")
-    axs[2].axis('off')
-
-    st.pyplot(fig)
+    def dibujar_mapa_2d():
+        fig, axs = plt.subplots(1, 3, figsize=(22,6))
+        axs[0].imshow(imagen, cmap='gray')
+        axs[0].set_title(f"Estímulo visual: {estímulo}")
+        axs[0].axis('off')
+
+        axs[1].imshow(campo, cmap='bwr', vmin=-6, vmax=6)
+        axs[1].set_title(f"Campo receptivo: {tipo_celda}")
+        for i in range(5):
+            for j in range(5):
+                val = campo[i,j]
+                axs[1].text(j, i, f"{val:.0f}", ha='center', va='center', color='black', fontsize=8)
+        circ = plt.Circle((2,2), 2.0, color='black', fill=False, linestyle='--', linewidth=1)
+        axs[1].add_patch(circ)
+        axs[1].grid(True)
+        axs[1].axis('off')
+
+        axs[2].imshow(activaciones, cmap='viridis')
+        axs[2].set_title("Activación de múltiples células")
+        axs[2].axis('off')
+        return fig
+
+    mostrar_figura_compartida(("mapa_2d", huella, tipo_celda), dibujar_mapa_2d)
 
     st.markdown("""
     <div style="padding: 1em; background-color: #f0f0f0; border-radius: 8px;">
@@ -190,37 +188,30 @@ elif visualizacion == "Animación paso a paso":
     """, unsafe_allow_html=True)
 
 elif visualizacion == "Comparación ON / OFF / Combinado":
-    # Construir campos
-    campo_on = construir_campo("ON")
-    campo_off = construir_campo("OFF")
-
-    # Calcular activaciones
-    activaciones_on = calcular_activaciones(imagen, campo_on)
-    activaciones_off = calcular_activaciones(imagen, campo_off)
-
-    # Normalizar cada mapa por separado
-    norm_on = activaciones_on / np.max(activaciones_on) if np.max(activaciones_on) != 0 else activaciones_on
-    norm_off = activaciones_off / np.max(activaciones_off) if np.max(activaciones_off) != 0 else activaciones_off
-
-    # Combinación ponderada
-    activaciones_comb = norm_on - norm_off  # contraste entre ON y OFF
+    # Activaciones ON y OFF normalizadas por separado y su combinación (contraste entre ON y OFF),
+    # todo en una sola pasada por la imagen
+    salidas = ("norm_on", "norm_off", "comb")
+    mapas = calcular_compartido(("retina", huella, salidas), retina_fusionada, imagen, salidas)
+    norm_on, norm_off, activaciones_comb = mapas["norm_on"], mapas["norm_off"], mapas["comb"]
 
     # Visualizar
-    fig_comp, axs = plt.subplots(1, 3, figsize=(22,6))
+    def dibujar_comparacion():
+        fig_comp, axs = plt.subplots(1, 3, figsize=(22,6))
 
-    axs[0].imshow(norm_on, cmap='Greens')
-    axs[0].set_title("🟩 Activación Centro ON / Periferia OFF")
-    axs[0].axis('off')
+        axs[0].imshow(norm_on, cmap='Greens')
+        axs[0].set_title("🟩 Activación Centro ON / Periferia OFF")
+        axs[0].axis('off')
 
-    axs[1].imshow(norm_off, cmap='Purples')
-    axs[1].set_title("🟪 Activación Centro OFF / Periferia ON")
-    axs[1].axis('off')
+        axs[1].imshow(norm_off, cmap='Purples')
+        axs[1].set_title("🟪 Activación Centro OFF / Periferia ON")
+        axs[1].axis('off')
 
-    axs[2].imshow(activaciones_comb, cmap='bwr', vmin=-1, vmax=1)
-    axs[2].set_title("🔀 Activación combinada ON - OFF")
-    axs[2].axis('off')
+        axs[2].imshow(activaciones_comb, cmap='bwr', vmin=-1, vmax=1)
+        axs[2].set_title("🔀 Activación combinada ON - OFF")
+        axs[2].axis('off')
+        return fig_comp
 
-    st.pyplot(fig_comp)
+    mostrar_figura_compartida(("comparacion", huella), dibujar_comparacion)
 
     st.markdown("""
     <div style="padding: 1em; background-color: #f0f0f0; border-radius: 8px;">
@@ -233,22 +224,10 @@ elif visualizacion == "Comparación ON / OFF / Combinado":
     """, unsafe_allow_html=True)
 
 elif visualizacion == "Solo Bipolares":
-    activacion_on = procesamiento_bipolar(imagen)
-    activacion_off = procesamiento_bipolar_off(imagen)
-    
-    # Normalizar ON y OFF
-    norm_on = activacion_on.copy()
-    norm_off = activacion_off.copy()
-
-    if np.max(np.abs(norm_on)) != 0:
-            norm_on = norm_on / np.max(np.abs(norm_on))
-
-    if np.max(np.abs(norm_off)) != 0:
-            norm_off = norm_off / np.max(np.abs(norm_off))
-
-
-    # Contraste bipolar
-    contraste_bipolar = norm_on - norm_off
+    # Bipolares ON y OFF normalizadas y su contraste, en una sola pasada por la imagen
+    salidas = ("norm_bipolar_on", "norm_bipolar_off", "contraste_bipolar")
+    mapas = calcular_compartido(("retina", huella, salidas), retina_fusionada, imagen, salidas)
+    norm_on, norm_off, contraste_bipolar = mapas["norm_bipolar_on"], mapas["norm_bipolar_off"], mapas["contraste_bipolar"]
 
     fig_bip, axs = plt.subplots(1, 4, figsize=(28,6))
 
@@ -301,3 +280,145 @@ elif visualizacion == "Solo Bipolares":
     <br><b>En esta visualización, al mostrar solo el procesamiento bipolar, se observa una imagen suavizada, sin realce de bordes. Esto ilustra cómo las ganglionares enriquecen la percepción visual al añadir contraste espacial.</b>
     </div>
     """, unsafe_allow_html=True)
+
+elif visualizacion == "Vídeo en directo":
+    if not ruta_video:
+        st.info("Indica la ruta de un vídeo local o de una secuencia de imágenes en la barra lateral.")
+    else:
+        # El bucle actualiza los mismos contenedores en cada frame, sin volver a ejecutar el script
+        pipeline = PipelineVideo(ruta_video, tipo="ON" if tipo_celda.startswith("Centro ON") else "OFF",
+                                 fps_objetivo=fps_objetivo, temporal=modo_temporal)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("### 🎞 Estímulo (escala de grises)")
+            area_estimulo = st.empty()
+        with col2:
+            st.markdown(f"### 🧠 Activación ganglionar: {tipo_celda}")
+            area_activacion = st.empty()
+        area_fraccion = st.empty()
+        area_estadisticas = st.empty()
+
+        pipeline.iniciar()
+        try:
+            for salida in pipeline.resultados():
+                area_estimulo.image(salida["grises"], clamp=True, use_container_width=True)
+                area_activacion.image(salida["rgb"], use_container_width=True)
+                if modo_temporal:
+                    area_fraccion.metric(label="Píxeles recalculados", value=f"{salida['fraccion_actualizada']:.1%}")
+                area_estadisticas.table(pipeline.estadisticas())
+        except Exception as exc:
+            st.error(f"No se pudo procesar el vídeo: {exc}")
+        finally:
+            pipeline.detener()
+        area_estadisticas.table(pipeline.estadisticas())
+
+elif visualizacion == "Espigas ON / OFF":
+    espacio = st.session_state.setdefault("espacio", EspacioTrabajo())
+    eventos = calcular_en_segundo_plano(("espigas", huella, codificacion, pasos_espigas),
+                                        espigas_ganglionares, imagen, codificacion, pasos_espigas,
+                                        espacio=espacio, usa_buferes=True)
+    conteo_on, conteo_off = conteos(eventos, imagen.shape)
+
+    fig_esp, axs = plt.subplots(1, 3, figsize=(22,6))
+
+    axs[0].imshow(conteo_on, cmap='Greens')
+    axs[0].set_title("🟩 Espigas ganglionares ON")
+    axs[0].axis('off')
+
+    axs[1].imshow(conteo_off, cmap='Purples')
+    axs[1].set_title("🟪 Espigas ganglionares OFF")
+    axs[1].axis('off')
+
+    # Ráster: cada punto es un evento (instante, célula)
+    celula = eventos["y"].astype(np.int64) * imagen.shape[1] + eventos["x"]
+    es_on = eventos["p"] > 0
+    axs[2].scatter(eventos["t"][es_on], celula[es_on], s=1, color='green', label='ON')
+    axs[2].scatter(eventos["t"][~es_on], celula[~es_on], s=1, color='purple', label='OFF')
+    axs[2].set_title("⚡ Ráster de espigas")
+    axs[2].set_xlabel("Paso de tiempo (ms)")
+    axs[2].set_ylabel("Célula")
+    axs[2].legend(loc='upper right')
+
+    st.pyplot(fig_esp)
+
+    col1, col2 = st.columns(2)
+    col1.metric(label="Eventos", value=f"{eventos.size}")
+    col2.metric(label="Memoria (eventos / tensor denso)",
+                value=f"{eventos.nbytes / 1024:.1f} KiB / {2 * pasos_espigas * imagen.size * EVENTO['p'].itemsize / 1024:.1f} KiB")
+
+elif visualizacion == "Progresivo (imagen grande)":
+    if archivo_imagen is not None:
+        from PIL import Image
+        imagen = np.asarray(Image.open(archivo_imagen).convert("L"))
+    region = None
+    if solo_region:
+        region = (imagen.shape[0] * filas_region[0] // 100, imagen.shape[0] * filas_region[1] // 100,
+                  imagen.shape[1] * columnas_region[0] // 100, imagen.shape[1] * columnas_region[1] // 100)
+
+    # Se muestra el nivel más grueso de inmediato y se refina nivel a nivel sobre los mismos contenedores
+    area_nivel = st.empty()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown("### 🟩 Centro ON / Periferia OFF")
+        area_on = st.empty()
+    with col2:
+        st.markdown("### 🟪 Centro OFF / Periferia ON")
+        area_off = st.empty()
+    with col3:
+        st.markdown("### 🔀 Combinada ON - OFF")
+        area_comb = st.empty()
+
+    inicio = time.perf_counter()
+    # Sin región, el refinado se detiene a la resolución de pantalla. OFF y combinada son el mapa ON
+    # escalado (OFF = -ON, comb = ON * (escala_on - escala_off) con escala positiva): colorear ya
+    # normaliza, así que basta con invertir la paleta de OFF y colorear ON con la de la combinada.
+    for i, (factor, zona, on, escala_on, escala_off) in enumerate(
+            activaciones_progresivas(imagen, region=region, lado_visible=1024)):
+        if i == 0:
+            primer_mapa = time.perf_counter() - inicio
+        area_on.image(colorear(on, "Greens"), use_container_width=True)
+        area_off.image(colorear(on, "Purples_r"), use_container_width=True)
+        area_comb.image(colorear(on, "bwr", simetrico=True), use_container_width=True)
+        detalle = "imagen completa" if zona is None else f"región filas {zona[0]}–{zona[1]}, columnas {zona[2]}–{zona[3]}"
+        area_nivel.markdown(f"**Nivel 1/{factor}** ({on.shape[0]}×{on.shape[1]}, {detalle}) · "
+                            f"primer mapa en {primer_mapa * 1000:.0f} ms · total {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    # Guardar todos los mapas troceados y comprimidos, para volver a abrirlos sin recalcular
+    if st.button("💾 Guardar mapas en disco (ON, OFF, bipolares y combinado)"):
+        ruta_resultados = f"resultados/{hashlib.sha1(np.ascontiguousarray(imagen).tobytes()).hexdigest()[:12]}"
+        lector = calcular_en_segundo_plano(("guardar", ruta_resultados), guardar_retina, ruta_resultados, imagen)
+        st.success(f"Mapas guardados en {ruta_resultados} ({lector.forma()[0]}×{lector.forma()[1]}, "
+                   f"{lector.niveles} niveles)")
+
+elif visualizacion == "Mosaico foveal":
+    # Estímulo ampliado para que quepan campos receptivos de distintos tamaños
+    imagen_grande = np.kron(imagen, np.ones((10, 10)))
+    celulas, operador = calcular_compartido(("mosaico", imagen_grande.shape, n_celulas), mosaico_compilado,
+                                            imagen_grande.shape, n_celulas)
+    respuestas = respuestas_mosaico(operador, imagen_grande)[:, 0]
+
+    fig_mos, axs = plt.subplots(1, 2, figsize=(22,10))
+
+    axs[0].imshow(imagen_grande, cmap='gray')
+    axs[0].scatter(celulas["x"], celulas["y"], s=celulas["escala"]**2 * 4, facecolors='none',
+                   edgecolors=np.where(celulas["polaridad"] > 0, 'green', 'purple'), linewidths=0.5)
+    axs[0].set_title(f"🧩 Mosaico foveal: {celulas.size} células (tamaño ∝ campo receptivo)")
+    axs[0].axis('off')
+
+    limite = max(np.max(np.abs(respuestas)), 1e-9)
+    axs[1].imshow(imagen_grande, cmap='gray', alpha=0.3)
+    puntos = axs[1].scatter(celulas["x"], celulas["y"], c=respuestas, cmap='bwr', vmin=-limite, vmax=limite,
+                            s=celulas["escala"]**2 * 4)
+    axs[1].set_title("⚡ Respuesta de cada célula")
+    axs[1].axis('off')
+    fig_mos.colorbar(puntos, ax=axs[1], label='Activación')
+
+    st.pyplot(fig_mos)
+
+    st.markdown("""
+    <div style="padding: 1em; background-color: #f0f0f0; border-radius: 8px;">
+    <b>🧩 Mosaico foveal:</b><br>
+    En la fóvea (centro) las células son pequeñas y muy densas; hacia la periferia sus campos receptivos crecen y su densidad disminuye.<br>
+    🟩 <b>Verde</b>: células Centro ON · 🟪 <b>Morado</b>: células Centro OFF.
+    </div>
+    """, unsafe_allow_html=True)
@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Ejecutor compartido por todas las sesiones; las tareas canceladas liberan su hilo enseguida
+_ejecutor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retina")
+
+
+class Cancelada(Exception):
+    pass
+
+
+# Manejador de un cómputo en segundo plano
+# La función lanzada recibe la tarea como argumento `tarea` y llama a informar() de vez en
+# cuando: así publica su progreso y un resultado parcial, y se detiene si la han cancelado.
+class Tarea:
+    def __init__(self, clave):
+        self.clave = clave
+        self.cancelado = threading.Event()
+        self.progreso = 0.0
+        self.parcial = None
+        self.futuro = None
+        self.usa_buferes = False
+
+    def informar(self, progreso, parcial=None):
+        if self.cancelado.is_set():
+            raise Cancelada()
+        self.progreso = progreso
+        if parcial is not None:
+            self.parcial = parcial
+
+    def cancelar(self):
+        self.cancelado.set()
+        self.futuro.cancel()
+
+    def terminada(self):
+        return self.futuro.done()
+
+    def fallida(self):
+        return self.futuro.done() and not self.futuro.cancelled() and self.futuro.exception() is not None
+
+    def resultado(self, timeout=None):
+        return self.futuro.result(timeout)
+
+
+def lanzar(clave, funcion, *args, **kwargs):
+    tarea = Tarea(clave)
+    tarea.futuro = _ejecutor.submit(funcion, *args, tarea=tarea, **kwargs)
+    return tarea
+
+
+# Cancela una tarea de sesión. Solo se espera a que se detenga (como mucho hasta su siguiente
+# informar()) si escribe en los búferes del espacio de trabajo de la sesión, que la siguiente
+# tarea va a reutilizar; las demás terminan por su cuenta sin bloquear el script.
+def _detener(tarea):
+    tarea.cancelar()
+    if tarea.usa_buferes:
+        wait([tarea.futuro])
+
+
+# Una tarea por sesión: si la clave de entrada cambia se cancela la anterior y se lanza otra;
+# si no cambia se reutiliza (en curso o ya terminada), salvo que haya fallado.
+def tarea_de_sesion(estado, clave, funcion, *args, nombre="tarea", usa_buferes=False, **kwargs):
+    tarea = estado.get(nombre)
+    if tarea is not None and tarea.clave == clave and not tarea.cancelado.is_set() and not tarea.fallida():
+        return tarea
+    if tarea is not None:
+        _detener(tarea)
+    tarea = lanzar(clave, funcion, *args, **kwargs)
+    tarea.usa_buferes = usa_buferes
+    estado[nombre] = tarea
+    return tarea
+
+
+# Cancela la tarea de la sesión (p. ej. al pasar a un modo que no lanza ningún cómputo)
+def cancelar_tarea_de_sesion(estado, nombre="tarea"):
+    tarea = estado.pop(nombre, None)
+    if tarea is not None:
+        _detener(tarea)
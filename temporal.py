@@ -0,0 +1,95 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from retina import construir_campo
+
+RADIO = 2  # semiancho del campo receptivo 5x5
+
+
+# Separar el campo en centro y periferia según el signo de la posición central
+def separar_campo(campo):
+    signo_centro = np.sign(campo[RADIO, RADIO])
+    centro = np.where(np.sign(campo) == signo_centro, campo, 0)
+    periferia = campo - centro
+    return centro, periferia
+
+
+# Dilatar una máscara booleana con una ventana cuadrada de semiancho `radio`
+def dilatar(mascara, radio=RADIO):
+    salida = mascara.copy()
+    for eje in (0, 1):
+        base = salida.copy()
+        for d in range(1, radio + 1):
+            if eje == 0:
+                salida[d:] |= base[:-d]
+                salida[:-d] |= base[d:]
+            else:
+                salida[:, d:] |= base[:, :-d]
+                salida[:, :-d] |= base[:, d:]
+    return salida
+
+
+# Modelo temporal ON/OFF
+# Centro y periferia pasan cada uno por un filtro paso bajo exponencial con su propia
+# constante de tiempo; la respuesta transitoria es la diferencia entre la entrada espacial
+# actual y su historia filtrada. Solo se recalculan los píxeles que han cambiado (y su
+# vecindario del campo receptivo) y los que aún no han vuelto al reposo.
+class RetinaTemporal:
+    def __init__(self, tipo="ON", tau_centro=2.0, tau_periferia=6.0, umbral=1e-3, tolerancia=1e-4):
+        self.centro, self.periferia = separar_campo(construir_campo(tipo))
+        self.alfa_centro = 1 - np.exp(-1.0 / tau_centro)
+        self.alfa_periferia = 1 - np.exp(-1.0 / tau_periferia)
+        self.umbral = umbral
+        self.tolerancia = tolerancia
+        self.anterior = None
+        self.fraccion_actualizada = 1.0
+
+    def _espacial(self, frame, indices=None):
+        relleno = np.pad(frame, RADIO, mode="edge")
+        ventanas = sliding_window_view(relleno, (2 * RADIO + 1, 2 * RADIO + 1))
+        if indices is not None:
+            ventanas = ventanas[indices]
+        return (np.einsum("...kl,kl->...", ventanas, self.centro).astype(np.float32),
+                np.einsum("...kl,kl->...", ventanas, self.periferia).astype(np.float32))
+
+    def reiniciar(self, frame):
+        frame = np.asarray(frame, dtype=np.float32)
+        self.anterior = frame.copy()
+        self.c, self.s = self._espacial(frame)
+        self.lc, self.ls = self.c.copy(), self.s.copy()
+        self.respuesta = np.zeros_like(frame)
+        self.activos = np.zeros(frame.shape, dtype=bool)
+        self.fraccion_actualizada = 1.0
+
+    def actualizar(self, frame):
+        frame = np.asarray(frame, dtype=np.float32)
+        if self.anterior is None or self.anterior.shape != frame.shape:
+            self.reiniciar(frame)
+            return self.salidas()
+
+        # Región sucia: píxeles que cambian más que el umbral y su vecindario 5x5
+        sucios = dilatar(np.abs(frame - self.anterior) > self.umbral)
+        np.copyto(self.anterior, frame, where=sucios)
+        indices = np.nonzero(sucios)
+        if indices[0].size:
+            self.c[indices], self.s[indices] = self._espacial(frame, indices)
+
+        # Filtros paso bajo solo donde hay cambios o respuestas aún no extinguidas
+        activos = np.nonzero(sucios | self.activos)
+        c, s = self.c[activos], self.s[activos]
+        lc = self.lc[activos] + self.alfa_centro * (c - self.lc[activos])
+        ls = self.ls[activos] + self.alfa_periferia * (s - self.ls[activos])
+        respuesta = (c - lc) + (s - ls)
+
+        # Los píxeles que vuelven al reposo se fijan exactamente y salen del conjunto activo
+        en_reposo = (np.abs(c - lc) < self.tolerancia) & (np.abs(s - ls) < self.tolerancia)
+        lc[en_reposo], ls[en_reposo], respuesta[en_reposo] = c[en_reposo], s[en_reposo], 0
+        self.lc[activos], self.ls[activos], self.respuesta[activos] = lc, ls, respuesta
+        self.activos[activos] = ~en_reposo
+
+        self.fraccion_actualizada = activos[0].size / frame.size
+        return self.salidas()
+
+    # Respuestas transitorias rectificadas: ON a incrementos, OFF a decrementos
+    def salidas(self):
+        return np.maximum(self.respuesta, 0), np.maximum(-self.respuesta, 0)
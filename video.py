@@ -0,0 +1,217 @@
+import glob
+import queue
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from retina import construir_campo, activaciones_vectorizadas
+from temporal import RetinaTemporal
+
+EXTENSIONES_IMAGEN = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"}
+FIN = None  # marca de fin de secuencia que recorre todas las etapas
+
+
+# Decodificación: vídeo local (OpenCV) o secuencia de imágenes (carpeta o patrón glob)
+def leer_frames(origen):
+    ruta = Path(origen)
+    if ruta.is_dir() or glob.has_magic(str(origen)):
+        from PIL import Image
+        archivos = sorted(ruta.iterdir()) if ruta.is_dir() else sorted(Path(p) for p in glob.glob(str(origen)))
+        for archivo in archivos:
+            if archivo.suffix.lower() in EXTENSIONES_IMAGEN:
+                with Image.open(archivo) as img:
+                    # Paleta, alfa, CMYK...: se decodifican a RGB para que a_grises reciba luminancias
+                    # (L, RGB y grises de 16 bits se dejan tal cual)
+                    yield np.asarray(img if img.mode in ("L", "RGB", "I;16") else img.convert("RGB"))
+        return
+
+    import cv2
+    captura = cv2.VideoCapture(str(ruta))
+    if not captura.isOpened():
+        raise ValueError(f"No se puede abrir el vídeo: {origen}")
+    try:
+        while True:
+            ok, frame = captura.read()
+            if not ok:
+                break
+            yield frame[..., ::-1]  # BGR -> RGB
+    finally:
+        captura.release()
+
+
+# Conversión a escala de grises en [0, 1]
+def a_grises(frame):
+    frame = np.asarray(frame)
+    escala = np.iinfo(frame.dtype).max if np.issubdtype(frame.dtype, np.integer) else 1.0
+    grises = frame.astype(np.float32)
+    if grises.ndim == 3:
+        grises = grises[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return grises / escala
+
+
+# Mapa de activación -> imagen RGB uint8 para st.image
+def colorear(activaciones, cmap="viridis", simetrico=False):
+    from matplotlib import colormaps
+    minimo, maximo = activaciones.min(), activaciones.max()
+    if simetrico:
+        maximo = max(abs(minimo), abs(maximo))
+        minimo = -maximo
+    normalizado = (activaciones - minimo) / (maximo - minimo) if maximo > minimo else np.zeros_like(activaciones)
+    return colormaps[cmap](normalizado, bytes=True)[..., :3]
+
+
+# Contadores de una etapa: frames procesados, descartados y latencia
+class EstadisticasEtapa:
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.frames = 0
+        self.descartados = 0
+        self.tiempo_total = 0.0
+        self.ultima = 0.0
+
+    def registrar(self, segundos):
+        self.frames += 1
+        self.tiempo_total += segundos
+        self.ultima = segundos
+
+    def resumen(self):
+        media = self.tiempo_total / self.frames if self.frames else 0.0
+        return {"etapa": self.nombre, "frames": self.frames, "descartados": self.descartados,
+                "latencia media (ms)": round(media * 1000, 2), "latencia última (ms)": round(self.ultima * 1000, 2)}
+
+
+# Pipeline en streaming: decodificar -> grises -> activación -> render
+# Cada etapa corre en su propio hilo y se comunica con la siguiente mediante una cola acotada.
+# Si una etapa se retrasa, se descarta el frame más antiguo de su cola de entrada para
+# mostrar siempre el estado más reciente del vídeo.
+# En modo temporal la etapa de activación usa RetinaTemporal y entrega ON - OFF transitorio.
+class PipelineVideo:
+    def __init__(self, origen, tipo="ON", fps_objetivo=15.0, tamaño_cola=2, cmap="viridis", temporal=False):
+        self.origen = origen
+        self.campo = construir_campo(tipo)
+        self.retina_temporal = RetinaTemporal(tipo) if temporal else None
+        self.fps_objetivo = fps_objetivo
+        self.cmap = cmap
+        self.detenido = threading.Event()
+        self.error = None
+        self.colas = [queue.Queue(maxsize=tamaño_cola) for _ in range(4)]
+        self.estadisticas_etapas = [EstadisticasEtapa(n) for n in ("decodificar", "grises", "activación", "render")]
+        self.latencia_total = EstadisticasEtapa("extremo a extremo")
+        # Quién lee de cada cola: ahí se contabilizan los frames descartados
+        self.lectores = self.estadisticas_etapas[1:] + [self.latencia_total]
+        self.hilos = []
+
+    def iniciar(self):
+        etapas = [
+            (self._decodificar, ()),
+            (self._transformar, (0, self._grises)),
+            (self._transformar, (1, self._activar)),
+            (self._transformar, (2, self._render)),
+        ]
+        for funcion, args in etapas:
+            hilo = threading.Thread(target=funcion, args=args, daemon=True)
+            hilo.start()
+            self.hilos.append(hilo)
+        return self
+
+    def detener(self):
+        self.detenido.set()
+        for hilo in self.hilos:
+            hilo.join(timeout=1.0)
+
+    def estadisticas(self):
+        return [e.resumen() for e in self.estadisticas_etapas + [self.latencia_total]]
+
+    # Consumidor: entrega los frames renderizados hasta el final del vídeo o hasta detener()
+    def resultados(self):
+        salida = self.colas[3]
+        while not self.detenido.is_set():
+            try:
+                item = salida.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is FIN:
+                break
+            self.latencia_total.registrar(time.perf_counter() - item["t0"])
+            yield item
+        if self.error is not None:
+            raise self.error
+
+    # Cola acotada con descarte del elemento más antiguo; FIN nunca se descarta
+    def _poner(self, indice, item):
+        cola = self.colas[indice]
+        while not self.detenido.is_set():
+            try:
+                cola.put(item, timeout=0.1) if item is FIN else cola.put_nowait(item)
+                return
+            except queue.Full:
+                if item is FIN:
+                    continue
+                try:
+                    cola.get_nowait()
+                    self.lectores[indice].descartados += 1
+                except queue.Empty:
+                    pass
+
+    def _decodificar(self):
+        periodo = 1.0 / self.fps_objetivo if self.fps_objetivo else 0.0
+        siguiente = time.perf_counter()
+        estadisticas = self.estadisticas_etapas[0]
+        try:
+            frames = leer_frames(self.origen)
+            while not self.detenido.is_set():
+                t0 = time.perf_counter()
+                frame = next(frames, FIN)
+                if frame is FIN:
+                    break
+                estadisticas.registrar(time.perf_counter() - t0)
+                self._poner(0, {"indice": estadisticas.frames - 1, "t0": t0, "frame": frame})
+                # Ritmo de salida según los FPS objetivo
+                siguiente += periodo
+                espera = siguiente - time.perf_counter()
+                if espera > 0:
+                    self.detenido.wait(espera)
+                else:
+                    siguiente = time.perf_counter()
+        except Exception as exc:
+            self.error = exc
+        self._poner(0, FIN)
+
+    def _transformar(self, indice, funcion):
+        entrada = self.colas[indice]
+        estadisticas = self.estadisticas_etapas[indice + 1]
+        while not self.detenido.is_set():
+            try:
+                item = entrada.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is FIN:
+                break
+            t0 = time.perf_counter()
+            try:
+                funcion(item)
+            except Exception as exc:
+                self.error = exc
+                break
+            estadisticas.registrar(time.perf_counter() - t0)
+            self._poner(indice + 1, item)
+        self._poner(indice + 1, FIN)
+
+    def _grises(self, item):
+        item["grises"] = a_grises(item.pop("frame"))
+
+    def _activar(self, item):
+        if self.retina_temporal is None:
+            item["activaciones"] = activaciones_vectorizadas(item["grises"], self.campo)
+        else:
+            on, off = self.retina_temporal.actualizar(item["grises"])
+            item["activaciones"] = on - off
+            item["fraccion_actualizada"] = self.retina_temporal.fraccion_actualizada
+
+    def _render(self, item):
+        if self.retina_temporal is None:
+            item["rgb"] = colorear(item["activaciones"], self.cmap)
+        else:
+            item["rgb"] = colorear(item["activaciones"], "bwr", simetrico=True)